@@ -0,0 +1,172 @@
+"""
+Module for caching LLM responses, with an exact on-disk tier and an in-memory semantic tier.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Optional
+
+import diskcache
+import numpy as np
+import orjson
+
+# Responses are only cached for deterministic (temperature 0) calls.
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", "/tmp/llm_cache")
+CACHE_TTL = 3600  # in seconds
+
+# Minimum cosine similarity for a near-duplicate prompt to reuse a response.
+SIMILARITY_THRESHOLD = 0.92
+
+_CACHE = diskcache.Cache(CACHE_DIR)
+
+
+def cache_key(
+    model: str,
+    messages: list[dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    schema: Optional[dict[str, Any]],
+) -> Optional[str]:
+    """
+    Build the exact-match cache key for a chat completion request.
+
+    Parameters
+    ----------
+    model : str
+        The OpenAI model the request is sent to.
+    messages : list[dict[str, str]]
+        The chat messages of the request.
+    temperature : float
+        The sampling temperature of the request.
+    max_tokens : int
+        Maximum number of tokens in the response.
+    schema : Optional[dict[str, Any]]
+        JSON schema for structured output, if any.
+
+    Returns
+    -------
+    Optional[str]
+        A SHA-256 hex digest identifying the request, or None if the request
+        is non-deterministic (temperature > 0) and must not be cached.
+    """
+    if temperature > 0:
+        return None
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "schema": schema,
+    }
+    encoded = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def get_response(key: str) -> Optional[str]:
+    """Return the cached response content for ``key``, or None on a miss."""
+    return _CACHE.get(key)
+
+
+def set_response(key: str, content: str, expire: int = CACHE_TTL) -> None:
+    """Cache the response content for ``key`` for ``expire`` seconds."""
+    _CACHE.set(key, content, expire=expire)
+
+
+class _Scope:
+    """Ring buffer of embeddings, responses and insert times for one scope."""
+
+    __slots__ = ("vectors", "contents", "inserted", "size", "next")
+
+    def __init__(self, dim: int, capacity: int) -> None:
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.contents: list[Optional[str]] = [None] * capacity
+        self.inserted = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+        self.next = 0
+
+    def grow(self, capacity: int) -> None:
+        """Enlarge the buffer; only called while it has never wrapped around."""
+        vectors = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+        vectors[: self.size] = self.vectors[: self.size]
+        inserted = np.empty(capacity, dtype=np.float64)
+        inserted[: self.size] = self.inserted[: self.size]
+        self.vectors = vectors
+        self.inserted = inserted
+        self.contents.extend([None] * (capacity - len(self.contents)))
+
+
+class SemanticCache:
+    """
+    In-memory nearest-neighbour lookup over normalized prompt embeddings.
+
+    Entries are grouped by a scope key (typically the exact cache key of the
+    request without its user message) so that only prompts sent with the same
+    model, system prompt and schema can match each other. Similarity is the
+    inner product of unit vectors, i.e. cosine similarity. Entries expire
+    after ``ttl`` seconds, like the exact tier, and each scope keeps at most
+    ``max_entries`` of them, overwriting the oldest first.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = 10_000,
+        ttl: float = CACHE_TTL,
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._scopes: dict[str, _Scope] = {}
+
+    def search(self, scope: str, vector: np.ndarray) -> Optional[str]:
+        """
+        Return the content of the most similar cached prompt in ``scope``.
+
+        Parameters
+        ----------
+        scope : str
+            The scope key the prompt belongs to.
+        vector : np.ndarray
+            The unit-normalized embedding of the prompt.
+
+        Returns
+        -------
+        Optional[str]
+            The cached content if it has not expired and its similarity is at
+            least ``threshold``, otherwise None.
+        """
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is None or entries.size == 0:
+                return None
+            similarities = entries.vectors[: entries.size] @ vector
+            expired = entries.inserted[: entries.size] < time.monotonic() - self.ttl
+            similarities[expired] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            return entries.contents[best]
+
+    def add(self, scope: str, vector: np.ndarray, content: str) -> None:
+        """Store ``content`` under the unit-normalized embedding ``vector``."""
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is None:
+                entries = self._scopes[scope] = _Scope(
+                    vector.shape[0], min(64, self.max_entries)
+                )
+            capacity = entries.vectors.shape[0]
+            # Grow geometrically until full, then overwrite the oldest entry.
+            if entries.next == capacity and capacity < self.max_entries:
+                entries.grow(min(capacity * 2, self.max_entries))
+                capacity = entries.vectors.shape[0]
+            index = entries.next % capacity
+            entries.vectors[index] = vector
+            entries.contents[index] = content
+            entries.inserted[index] = time.monotonic()
+            entries.size = min(entries.size + 1, capacity)
+            entries.next = index + 1
@@ -1,24 +1,186 @@
 """
-Module for making synchronous calls to OpenAI's API with rate limiting.
+Module for making synchronous and concurrent calls to OpenAI's API with rate limiting.
 """
 
+import asyncio
+import io
 import os
-import json
+import threading
+import time
+from collections.abc import Iterator, Sequence
 from typing import Any, Optional, Union
 
+import aiohttp
+import msgspec
+import numpy as np
+import orjson
 import requests
-from ratelimit import limits, sleep_and_retry
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+from cache import SemanticCache, cache_key, get_response, set_response
+from throttle import TokenBucket
+
 load_dotenv()
 
+# Read once at import; fail here rather than sending "Bearer None" on every call.
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+if not OPENAI_API_KEY:
+    raise RuntimeError("OPENAI_API_KEY is not set")
+
 # Configure rate limiting: Maximum 10 calls per minute
 MAX_CALLS = 10
 PERIOD = 60  # in seconds
 
+OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+EMBEDDING_MODEL = "text-embedding-3-small"
+FILES_URL = "https://api.openai.com/v1/files"
+BATCHES_URL = "https://api.openai.com/v1/batches"
+
+# Batch jobs that are no longer running, whatever their outcome.
+_BATCH_FINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# Shared connection pool so repeated calls reuse TCP/TLS connections.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,
+        ),
+    ),
+)
+_SESSION.headers.update(
+    {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Connection": "keep-alive",
+    }
+)
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_ASYNC_HEADERS = {
+    "Content-Type": "application/json",
+    "Authorization": f"Bearer {OPENAI_API_KEY}",
+}
+
+_SEMANTIC_CACHE = SemanticCache()
+
+_RATE_LIMITER = TokenBucket(MAX_CALLS, PERIOD)
+
+
+def _warm_up() -> None:
+    """Open a pooled connection to the API host so the first call skips TCP/TLS setup."""
+    try:
+        _SESSION.head(OPENAI_URL, timeout=10)
+    except requests.RequestException:
+        pass
+
+
+threading.Thread(target=_warm_up, daemon=True).start()
+
+
+class ChatMessage(msgspec.Struct):
+    """A message, or a streamed delta of one; other fields are skipped when decoding."""
+
+    content: Optional[str] = None
+
+
+class ChatChoice(msgspec.Struct):
+    message: ChatMessage
+
+
+class ChatCompletion(msgspec.Struct):
+    """The parts of a chat completions response that are used."""
+
+    choices: list[ChatChoice]
+
+
+class ChatChunkChoice(msgspec.Struct):
+    delta: ChatMessage
+
+
+class ChatCompletionChunk(msgspec.Struct):
+    """The parts of a streamed chat completions chunk that are used."""
+
+    choices: list[ChatChunkChoice] = []
+
+
+_COMPLETION_DECODER = msgspec.json.Decoder(ChatCompletion)
+_CHUNK_DECODER = msgspec.json.Decoder(ChatCompletionChunk)
+
+
+def _build_payload(
+    system_prompt: str,
+    user_prompt: str,
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    schema: Optional[dict[str, Any]],
+) -> dict[str, Any]:
+    """Build the chat completions request body shared by the sync and async paths."""
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": "response", "schema": schema},
+        }
+        if schema
+        else {"type": "text"},
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+
+def _decode_content(
+    content: str,
+    schema: Optional[dict[str, Any]],
+) -> Union[str, dict[str, Any]]:
+    """Return the message content as a string, or parsed as JSON when schema is provided."""
+    if schema is not None:
+        return orjson.loads(content)
+    return content
+
+
+def _embed(text: str) -> np.ndarray:
+    """Return the unit-normalized OpenAI embedding of ``text``."""
+    response = _SESSION.post(
+        EMBEDDINGS_URL,
+        headers=_JSON_HEADERS,
+        data=orjson.dumps({"model": EMBEDDING_MODEL, "input": text}),
+        timeout=60,
+    )
+    response.raise_for_status()
+    embedding = orjson.loads(response.content)["data"][0]["embedding"]
+    vector = np.asarray(embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _post_chat_completion(payload: dict[str, Any]) -> str:
+    """Send a chat completions request with rate limiting and return the message content."""
+    _RATE_LIMITER.acquire()
+    response = _SESSION.post(
+        OPENAI_URL,
+        headers=_JSON_HEADERS,
+        data=orjson.dumps(payload),
+        timeout=300,
+    )
+    response.raise_for_status()
+
+    return _COMPLETION_DECODER.decode(response.content).choices[0].message.content
+
 
-@sleep_and_retry
-@limits(calls=MAX_CALLS, period=PERIOD)
 def call_llm(
     system_prompt: str,
     user_prompt: str,
@@ -26,10 +188,15 @@ def call_llm(
     max_tokens: int = 8192,
     temperature: float = 1.0,
     schema: Optional[dict[str, Any]] = None,
+    semantic_cache: bool = False,
 ) -> Union[str, dict[str, Any]]:
     """
     Make a synchronous call to OpenAI's API with rate limiting.
 
+    Deterministic calls (temperature 0) are answered from the response cache
+    when the exact same request was made before, without consuming the rate
+    limit.
+
     Parameters
     ----------
     system_prompt : str
@@ -44,6 +211,9 @@ def call_llm(
         Controls randomness in the response (0.0 to 1.0), by default 0.0
     schema : Optional[dict[str, Any]], optional
         JSON schema for structured output, by default None
+    semantic_cache : bool, optional
+        For deterministic calls, also reuse the response of a previous call
+        whose user prompt embedding is nearly identical, by default False
 
     Returns
     -------
@@ -55,39 +225,395 @@ def call_llm(
     ------
     requests.exceptions.RequestException
         If the API call fails
+    msgspec.DecodeError
+        If the API response body is not valid JSON, or (as
+        ``msgspec.ValidationError``) not a chat completion
     json.JSONDecodeError
-        If the response cannot be parsed as JSON when schema is provided
+        If the response content cannot be parsed as JSON when schema is provided
     """
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
-    }
+    payload = _build_payload(
+        system_prompt, user_prompt, model, max_tokens, temperature, schema
+    )
 
-    payload = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        "response_format": {
-            "type": "json_schema",
-            "json_schema": {"name": "response", "schema": schema},
+    key = cache_key(model, payload["messages"], temperature, max_tokens, schema)
+    if key is not None:
+        cached = get_response(key)
+        if cached is not None:
+            return _decode_content(cached, schema)
+        if semantic_cache:
+            # Only prompts sharing the system prompt and settings may match.
+            scope = cache_key(
+                model, payload["messages"][:1], temperature, max_tokens, schema
+            )
+            vector = _embed(user_prompt)
+            cached = _SEMANTIC_CACHE.search(scope, vector)
+            if cached is not None:
+                return _decode_content(cached, schema)
+
+    content = _post_chat_completion(payload)
+
+    if key is not None:
+        set_response(key, content)
+        if semantic_cache:
+            _SEMANTIC_CACHE.add(scope, vector, content)
+    return _decode_content(content, schema)
+
+
+def call_llm_stream(
+    system_prompt: str,
+    user_prompt: str,
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 8192,
+    temperature: float = 1.0,
+    schema: Optional[dict[str, Any]] = None,
+) -> Iterator[str]:
+    """
+    Make a streaming call to OpenAI's API with rate limiting.
+
+    The response content is yielded piece by piece as the model generates it,
+    so callers can start processing before the completion has finished.
+    Streamed responses are never cached.
+
+    Parameters
+    ----------
+    system_prompt : str
+        The system message to provide context to the model.
+    user_prompt : str
+        The user message/prompt to generate content from.
+    model : str, optional
+        The OpenAI model to use, by default "gpt-4o-mini"
+    max_tokens : int, optional
+        Maximum number of tokens in the response, by default 8192
+    temperature : float, optional
+        Controls randomness in the response, by default 1.0
+    schema : Optional[dict[str, Any]], optional
+        JSON schema for structured output, by default None. The pieces are
+        fragments of the JSON document; join them before parsing.
+
+    Yields
+    ------
+    str
+        The next piece of the model's response.
+
+    Raises
+    ------
+    requests.exceptions.RequestException
+        If the API call fails
+    msgspec.DecodeError
+        If a streamed chunk is not valid JSON, or (as
+        ``msgspec.ValidationError``) not a chat completion chunk
+    """
+    payload = _build_payload(
+        system_prompt, user_prompt, model, max_tokens, temperature, schema
+    )
+    payload["stream"] = True
+
+    _RATE_LIMITER.acquire()
+    with _SESSION.post(
+        OPENAI_URL,
+        headers=_JSON_HEADERS,
+        data=orjson.dumps(payload),
+        stream=True,
+        timeout=300,
+    ) as response:
+        response.raise_for_status()
+        # Server-sent events: one "data: <json>" line per chunk, then "data: [DONE]".
+        for line in response.iter_lines():
+            if not line.startswith(b"data: "):
+                continue
+            data = line[6:]
+            if data == b"[DONE]":
+                break
+            choices = _CHUNK_DECODER.decode(data).choices
+            if choices:
+                content = choices[0].delta.content
+                if content:
+                    yield content
+
+
+async def _call_llm_async(
+    session: aiohttp.ClientSession,
+    payload: dict[str, Any],
+) -> str:
+    """
+    Send a chat completions request asynchronously and return the message content.
+
+    Rate limiting and caching are left to the caller; see ``AsyncOpenAIClient``.
+    """
+    async with session.post(
+        OPENAI_URL,
+        headers=_ASYNC_HEADERS,
+        data=orjson.dumps(payload),
+        timeout=aiohttp.ClientTimeout(total=300),
+    ) as response:
+        response.raise_for_status()
+        data = _COMPLETION_DECODER.decode(await response.read())
+
+    return data.choices[0].message.content
+
+
+class AsyncOpenAIClient:
+    """
+    Concurrent OpenAI client sharing one connection pool.
+
+    At most ``max_calls`` requests are in flight at once. Requests are started
+    from the module-wide rate limit shared with ``call_llm`` and
+    ``call_llm_stream``, so all OpenAI calls in the process stay within
+    ``MAX_CALLS`` per ``PERIOD``. Use as an async context manager so the
+    session is closed::
+
+        async with AsyncOpenAIClient() as client:
+            answer = await client.call(system_prompt, user_prompt)
+    """
+
+    def __init__(self, max_calls: int = MAX_CALLS) -> None:
+        self.max_calls = max_calls
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncOpenAIClient":
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_calls, keepalive_timeout=75)
+        )
+        self._semaphore = asyncio.Semaphore(self.max_calls)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the underlying session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def call(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: str = "gpt-4o-mini",
+        max_tokens: int = 8192,
+        temperature: float = 1.0,
+        schema: Optional[dict[str, Any]] = None,
+    ) -> Union[str, dict[str, Any]]:
+        """Rate-limited ``call_llm`` without the semantic cache; see it for parameters."""
+        if self._session is None:
+            raise RuntimeError(
+                "AsyncOpenAIClient must be used as an async context manager"
+            )
+        payload = _build_payload(
+            system_prompt, user_prompt, model, max_tokens, temperature, schema
+        )
+
+        key = cache_key(model, payload["messages"], temperature, max_tokens, schema)
+        if key is not None:
+            cached = get_response(key)
+            if cached is not None:
+                return _decode_content(cached, schema)
+
+        async with self._semaphore:
+            await asyncio.sleep(_RATE_LIMITER.reserve())
+            content = await _call_llm_async(self._session, payload)
+
+        if key is not None:
+            set_response(key, content)
+        return _decode_content(content, schema)
+
+    async def call_many(
+        self,
+        prompts: Sequence[tuple[str, str]],
+        model: str = "gpt-4o-mini",
+        max_tokens: int = 8192,
+        temperature: float = 1.0,
+        schema: Optional[dict[str, Any]] = None,
+    ) -> list[Union[str, dict[str, Any], Exception]]:
+        """Fire every ``(system_prompt, user_prompt)`` pair concurrently."""
+        return await asyncio.gather(
+            *(
+                self.call(
+                    system_prompt,
+                    user_prompt,
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    schema=schema,
+                )
+                for system_prompt, user_prompt in prompts
+            ),
+            return_exceptions=True,
+        )
+
+
+def call_llm_many(
+    prompts: Sequence[tuple[str, str]],
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 8192,
+    temperature: float = 1.0,
+    schema: Optional[dict[str, Any]] = None,
+) -> list[Union[str, dict[str, Any], Exception]]:
+    """
+    Make concurrent calls to OpenAI's API for a batch of prompts.
+
+    Requests overlap on the network while still respecting the
+    ``MAX_CALLS`` per ``PERIOD`` rate limit.
+
+    Parameters
+    ----------
+    prompts : Sequence[tuple[str, str]]
+        ``(system_prompt, user_prompt)`` pairs to send.
+    model : str, optional
+        The OpenAI model to use, by default "gpt-4o-mini"
+    max_tokens : int, optional
+        Maximum number of tokens in each response, by default 8192
+    temperature : float, optional
+        Controls randomness in the responses, by default 1.0
+    schema : Optional[dict[str, Any]], optional
+        JSON schema for structured output, by default None
+
+    Returns
+    -------
+    list[Union[str, dict[str, Any], Exception]]
+        One entry per prompt, in input order: the response as returned by
+        ``call_llm``, or the Exception raised for that prompt.
+    """
+
+    async def _run() -> list[Union[str, dict[str, Any], Exception]]:
+        async with AsyncOpenAIClient() as client:
+            return await client.call_many(
+                prompts,
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                schema=schema,
+            )
+
+    return asyncio.run(_run())
+
+
+def call_llm_batch(
+    prompts: Sequence[tuple[str, str]],
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 8192,
+    temperature: float = 1.0,
+    schema: Optional[dict[str, Any]] = None,
+    poll_interval: float = 10.0,
+    max_poll_interval: float = 300.0,
+) -> list[Union[str, dict[str, Any], Exception]]:
+    """
+    Run a batch of prompts through OpenAI's Batch API and wait for the results.
+
+    The Batch API is cheaper and has much higher throughput limits than
+    ``call_llm``, but may take up to 24 hours. Use it for offline workloads
+    that can tolerate the latency.
+
+    Parameters
+    ----------
+    prompts : Sequence[tuple[str, str]]
+        ``(system_prompt, user_prompt)`` pairs to send.
+    model : str, optional
+        The OpenAI model to use, by default "gpt-4o-mini"
+    max_tokens : int, optional
+        Maximum number of tokens in each response, by default 8192
+    temperature : float, optional
+        Controls randomness in the responses, by default 1.0
+    schema : Optional[dict[str, Any]], optional
+        JSON schema for structured output, by default None
+    poll_interval : float, optional
+        Seconds to wait before first checking on the batch, doubled after
+        every check, by default 10.0
+    max_poll_interval : float, optional
+        Upper bound on the seconds between checks, by default 300.0
+
+    Returns
+    -------
+    list[Union[str, dict[str, Any], Exception]]
+        One entry per prompt, in input order: the response as returned by
+        ``call_llm``, or an Exception describing why that prompt failed.
+
+    Raises
+    ------
+    requests.exceptions.RequestException
+        If uploading, creating or polling the batch fails
+    RuntimeError
+        If the batch ends without completing
+    """
+    requests_file = io.BytesIO()
+    for index, (system_prompt, user_prompt) in enumerate(prompts):
+        request = {
+            "custom_id": str(index),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _build_payload(
+                system_prompt, user_prompt, model, max_tokens, temperature, schema
+            ),
         }
-        if schema
-        else {"type": "text"},
-        "temperature": temperature,
-        "max_tokens": max_tokens,
-    }
+        requests_file.write(orjson.dumps(request) + b"\n")
+    requests_file.seek(0)
 
-    response = requests.post(url, headers=headers, json=payload, timeout=300)
+    response = _SESSION.post(
+        FILES_URL,
+        data={"purpose": "batch"},
+        files={"file": ("batch.jsonl", requests_file, "application/jsonl")},
+        timeout=300,
+    )
     response.raise_for_status()
+    input_file_id = orjson.loads(response.content)["id"]
 
-    content = response.json()["choices"][0]["message"]["content"]
+    response = _SESSION.post(
+        BATCHES_URL,
+        headers=_JSON_HEADERS,
+        data=orjson.dumps(
+            {
+                "input_file_id": input_file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h",
+            }
+        ),
+        timeout=60,
+    )
+    response.raise_for_status()
+    batch = orjson.loads(response.content)
 
-    if schema is not None:
-        return json.loads(content)
-    return content
+    delay = poll_interval
+    while batch["status"] not in _BATCH_FINAL_STATUSES:
+        time.sleep(delay)
+        delay = min(delay * 2, max_poll_interval)
+        response = _SESSION.get(f"{BATCHES_URL}/{batch['id']}", timeout=60)
+        response.raise_for_status()
+        batch = orjson.loads(response.content)
+
+    if batch["status"] != "completed":
+        raise RuntimeError(f"OpenAI batch {batch['id']} ended with status {batch['status']}")
+
+    results: list[Union[str, dict[str, Any], Exception]] = [
+        RuntimeError(f"OpenAI batch {batch['id']} returned no result for this prompt")
+        for _ in prompts
+    ]
+    # Successful requests are in the output file, failed ones in the error file.
+    for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+        if not file_id:
+            continue
+        response = _SESSION.get(f"{FILES_URL}/{file_id}/content", timeout=300)
+        response.raise_for_status()
+        for line in response.content.splitlines():
+            if not line:
+                continue
+            record = orjson.loads(line)
+            index = int(record["custom_id"])
+            result = record.get("response") or {}
+            body = result.get("body") or {}
+            if record.get("error") or result.get("status_code") != 200:
+                error = record.get("error") or body.get("error")
+                results[index] = RuntimeError(f"OpenAI batch request failed: {error}")
+                continue
+            try:
+                results[index] = _decode_content(
+                    body["choices"][0]["message"]["content"], schema
+                )
+            except ValueError as e:
+                results[index] = e
+
+    return results
 
 
 if __name__ == "__main__":
@@ -114,5 +640,23 @@ if __name__ == "__main__":
             schema=schema,
         )
         print("\nStructured response:", structured_response)
+
+        # Example streaming usage (prints the response as it is generated)
+        print("\nStreamed response: ", end="")
+        for piece in call_llm_stream(
+            system_prompt="You are a helpful assistant.",
+            user_prompt="Describe Paris in two sentences.",
+        ):
+            print(piece, end="", flush=True)
+        print()
+
+        # Example concurrent usage (one entry per prompt, in order)
+        responses = call_llm_many(
+            prompts=[
+                ("You are a helpful assistant.", "What is the capital of France?"),
+                ("You are a helpful assistant.", "What is the capital of Spain?"),
+            ],
+        )
+        print("\nConcurrent responses:", responses)
     except Exception as e:
         print(f"An error occurred: {str(e)}")
@@ -1,23 +1,96 @@
 """
-Module for making synchronous calls to Olostep's API with rate limiting.
+Module for making synchronous and concurrent calls to Olostep's API with rate limiting.
 """
 
 import os
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 from typing import Literal, Optional
+from urllib.parse import urlparse
 
+import orjson
 import requests
-from ratelimit import limits, sleep_and_retry
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+from throttle import DomainRateLimiter, TokenBucket
+
 load_dotenv()
 
+# Read once at import; fail here rather than sending "Bearer None" on every call.
+OLOSTEP_API_KEY = os.getenv("OLOSTEP_API_KEY")
+if not OLOSTEP_API_KEY:
+    raise RuntimeError("OLOSTEP_API_KEY is not set")
+
 # Configure rate limiting: Maximum 10 calls per minute
 MAX_CALLS = 10
 PERIOD = 60  # in seconds
 
+# Configure per-domain politeness: Maximum 1 scrape per second of any one site
+DOMAIN_MAX_CALLS = 1
+DOMAIN_PERIOD = 1  # in seconds
+
+# Failed or empty scrapes are remembered for 15 minutes instead of retried.
+NEGATIVE_CACHE_TTL = 900  # in seconds
+# Olostep statuses meaning the URL itself is gone. Other errors (bad parameters,
+# key or plan problems) are about our request and keep raising.
+NEGATIVE_CACHE_STATUSES = frozenset({404, 410})
+
+OLOSTEP_URL = "https://api.olostep.com/v1/scrapes"
+
+# Ask for compressed responses; Brotli only when a decoder for it is installed.
+_ACCEPT_ENCODING = "br, gzip" if find_spec("brotli") or find_spec("brotlicffi") else "gzip"
+
+# Shared connection pool so repeated calls reuse TCP/TLS connections.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,
+        ),
+    ),
+)
+_SESSION.headers.update(
+    {
+        "Authorization": f"Bearer {OLOSTEP_API_KEY}",
+        "Connection": "keep-alive",
+        "Accept-Encoding": _ACCEPT_ENCODING,
+    }
+)
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+_RATE_LIMITER = TokenBucket(MAX_CALLS, PERIOD)
+_DOMAIN_LIMITER = DomainRateLimiter(DOMAIN_MAX_CALLS, DOMAIN_PERIOD)
+# Cap on concurrent Olostep requests, however many threads call scrape_url.
+_IN_FLIGHT = threading.Semaphore(MAX_CALLS)
+
+_FAILED_SCRAPES: TTLCache = TTLCache(maxsize=10_000, ttl=NEGATIVE_CACHE_TTL)
+_FAILED_SCRAPES_LOCK = threading.Lock()
+
+
+def _warm_up() -> None:
+    """Open a pooled connection to the API host so the first call skips TCP/TLS setup."""
+    try:
+        _SESSION.head(OLOSTEP_URL, timeout=10)
+    except requests.RequestException:
+        pass
+
+
+threading.Thread(target=_warm_up, daemon=True).start()
+
 
-@sleep_and_retry
-@limits(calls=MAX_CALLS, period=PERIOD)
 def scrape_url(
     url: str,
     format: Literal["markdown", "html"] = "markdown",
@@ -27,6 +100,11 @@ def scrape_url(
     """
     Make a synchronous call to Olostep's API with rate limiting.
 
+    Calls are limited both overall, to stay within the Olostep quota, and per
+    domain of the scraped URL, so no single site receives bursts. URLs that
+    are gone or returned no content are not scraped again with the same
+    settings for ``NEGATIVE_CACHE_TTL`` seconds.
+
     Parameters
     ----------
     url : str
@@ -41,18 +119,18 @@ def scrape_url(
     Returns
     -------
     Optional[str]
-        The scraped content if successful, None if failed
+        The scraped content if successful, None if no content was returned
+        or the URL is gone (status in ``NEGATIVE_CACHE_STATUSES``)
 
     Raises
     ------
     requests.exceptions.RequestException
-        If the API call fails
+        If the API call fails for any other reason
     """
-    api_url = "https://api.olostep.com/v1/scrapes"
-    headers = {
-        "Authorization": f"Bearer {os.getenv('OLOSTEP_API_KEY')}",
-        "Content-Type": "application/json",
-    }
+    key = (url, format, wait_ms)
+    with _FAILED_SCRAPES_LOCK:
+        if key in _FAILED_SCRAPES:
+            return None
 
     payload = {
         "url_to_scrape": url,
@@ -60,16 +138,70 @@ def scrape_url(
         "wait_before_scraping": wait_ms,
     }
 
-    response = requests.post(
-        api_url,
-        headers=headers,
-        json=payload,
-        timeout=timeout,
-    )
-    response.raise_for_status()
-    
-    data = response.json()
-    return data["result"].get(f"{format}_content")
+    _DOMAIN_LIMITER.acquire(urlparse(url).netloc)
+    _RATE_LIMITER.acquire()
+    with _IN_FLIGHT:
+        response = _SESSION.post(
+            OLOSTEP_URL,
+            headers=_JSON_HEADERS,
+            data=orjson.dumps(payload),
+            timeout=timeout,
+        )
+    if response.status_code in NEGATIVE_CACHE_STATUSES:
+        content = None
+    else:
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        content = data["result"].get(f"{format}_content")
+
+    if content is None:
+        with _FAILED_SCRAPES_LOCK:
+            _FAILED_SCRAPES[key] = None
+    return content
+
+
+def scrape_urls(
+    urls: Sequence[str],
+    format: Literal["markdown", "html"] = "markdown",
+    wait_ms: int = 1000,
+    timeout: int = 60,
+    max_workers: int = MAX_CALLS,
+) -> list[Optional[str] | Exception]:
+    """
+    Scrape a batch of URLs concurrently with rate limiting.
+
+    Each URL is scraped with ``scrape_url`` on a thread pool, so the Olostep
+    and per-domain rate limits still apply while network waits overlap.
+
+    Parameters
+    ----------
+    urls : Sequence[str]
+        The URLs to scrape
+    format : Literal["markdown", "html"], optional
+        The format to return the content in, by default "markdown"
+    wait_ms : int, optional
+        Time to wait before scraping in milliseconds, by default 1000
+    timeout : int, optional
+        Timeout in seconds for each request, by default 60
+    max_workers : int, optional
+        Maximum number of URLs scraped at once, by default MAX_CALLS
+
+    Returns
+    -------
+    list[Optional[str] | Exception]
+        One entry per URL, in input order: the result of ``scrape_url``, or
+        the Exception raised while scraping that URL.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(scrape_url, url, format, wait_ms, timeout) for url in urls
+        ]
+
+    results: list[Optional[str] | Exception] = []
+    for future in futures:
+        error = future.exception()
+        results.append(future.result() if error is None else error)
+    return results
 
 
 if __name__ == "__main__":
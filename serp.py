@@ -1,46 +1,168 @@
 """
-Module for interacting with the Serper API to fetch search engine results pages (SERPs) synchronously.
+Module for interacting with the Serper API to fetch search engine results pages (SERPs).
+
+Requests go through httpx; install it as ``httpx[http2]`` (which pulls in ``h2``)
+so batches are multiplexed over HTTP/2. Without ``h2`` the clients fall back to
+HTTP/1.1.
 """
 
+import asyncio
 import os
+import threading
 import urllib.parse
 from collections.abc import Sequence
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from importlib.util import find_spec
+from itertools import chain, zip_longest
+from typing import Any, Optional
 
-import requests
-from pydantic import BaseModel
-from ratelimit import limits, sleep_and_retry
+import httpx
+import msgspec
+import orjson
+from cachetools import TTLCache
 
 from dotenv import load_dotenv
+
+from throttle import TokenBucket
+
 load_dotenv()
 
+# Read once at import; fail here rather than sending an empty key on every call.
+SERPER_API_KEY = os.getenv("SERPER_API_KEY")
+if not SERPER_API_KEY:
+    raise RuntimeError("SERPER_API_KEY is not set")
+
 # Configure rate limiting: Maximum 10 calls per 1 second.
 MAX_CALLS = 10
 PERIOD = 1
 
+# Queries without results are remembered for 15 minutes instead of retried.
+NEGATIVE_CACHE_TTL = 900  # in seconds
+
+SERPER_URL = "https://google.serper.dev/search"
+
+# Ask for compressed responses; Brotli only when a decoder for it is installed.
+_ACCEPT_ENCODING = "br, gzip" if find_spec("brotli") or find_spec("brotlicffi") else "gzip"
+
+# Connection pool limits for the HTTP/2 clients; a batch is multiplexed over
+# as few TLS connections as possible.
+_HTTP2 = find_spec("h2") is not None
+_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+_RETRIES = 3
+_TIMEOUT = 10.0
+
+# Shared client so repeated batches reuse the same pooled connections.
+_CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(http2=_HTTP2, limits=_LIMITS, retries=_RETRIES),
+    timeout=_TIMEOUT,
+)
+
+_HEADERS = {
+    "Content-Type": "application/json",
+    "X-API-KEY": SERPER_API_KEY,
+    "Accept-Encoding": _ACCEPT_ENCODING,
+}
+
+_RATE_LIMITER = TokenBucket(MAX_CALLS, PERIOD)
 
-class SerpedSite(BaseModel):
+_EMPTY_QUERIES: TTLCache = TTLCache(maxsize=10_000, ttl=NEGATIVE_CACHE_TTL)
+_EMPTY_QUERIES_LOCK = threading.Lock()
+
+
+@dataclass(slots=True)
+class SerpedSite:
     url: str
     title: str
     snippet: str
     rich_snippet: Optional[list[str]] = None
     source: Optional[str] = None
 
+    def model_dump(self) -> dict[str, Any]:
+        """Return the site as a dict, as the former Pydantic model did."""
+        return asdict(self)
+
+
+class SerperOrganic(msgspec.Struct):
+    """One organic result of a Serper response; other fields are skipped when decoding."""
+
+    link: Optional[str] = None
+    title: Optional[str] = None
+    snippet: Optional[str] = None
+    source: Optional[str] = None
+
+
+class SerperResponse(msgspec.Struct):
+    """The parts of a Serper search response that are used."""
+
+    organic: Optional[list[SerperOrganic]] = None
+
+
+_RESPONSE_DECODER = msgspec.json.Decoder(SerperResponse)
+
+
+def _encode_query(query: str, num_sites_per_query: int) -> bytes:
+    """Return the encoded body of a Serper search request."""
+    payload = {
+        "q": query,
+        "gl": "us",
+        "type": "search",
+        "includeSubtitle": True,
+        "engine": "google",
+        # Only ask for as many results as will be kept.
+        "num": num_sites_per_query,
+        "page": 1,
+    }
+    return orjson.dumps(payload)
+
+
+def _parse_sites(content: bytes, num_sites_per_query: int) -> list[SerpedSite]:
+    """Build SerpedSite objects from the organic results of a Serper response body."""
+    # A missing or null "organic" means no results; null fields read as "".
+    organic = _RESPONSE_DECODER.decode(content).organic or []
+    make_site = SerpedSite  # Bound locally instead of a global lookup per result.
+    return [
+        make_site(
+            o.link or "", o.title or "", o.snippet or "", None, o.source or ""
+        )
+        for o in organic[:num_sites_per_query]
+    ]
+
+
+def _is_known_empty(query: str) -> bool:
+    """Whether ``query`` returned no results within the last ``NEGATIVE_CACHE_TTL``."""
+    with _EMPTY_QUERIES_LOCK:
+        return query in _EMPTY_QUERIES
+
+
+def _remember_if_empty(
+    query: str,
+    sites: list[SerpedSite],
+    num_sites_per_query: int,
+) -> None:
+    """Record ``query`` as having no results if the API returned none for it."""
+    if not sites and num_sites_per_query > 0:
+        with _EMPTY_QUERIES_LOCK:
+            _EMPTY_QUERIES[query] = True
+
 
-@sleep_and_retry
-@limits(calls=MAX_CALLS, period=PERIOD)
 def fetch_serper(
-    session: requests.Session,
+    session: httpx.Client,
     query: str,
     num_sites_per_query: int,
 ) -> list[SerpedSite]:
     """
     Query the SERP API for a single search query and return a list of sites.
 
+    Queries that returned no results are answered with an empty list, without
+    calling the API, for ``NEGATIVE_CACHE_TTL`` seconds.
+
     Parameters
     ----------
-    session : requests.Session
-        The HTTP session used for the API request.
+    session : httpx.Client
+        The HTTP client used for the API request. This used to be a
+        ``requests.Session``; pass an ``httpx.Client`` (such as the module's
+        shared one) instead.
     query : str
         The URL-encoded search query.
     num_sites_per_query : int
@@ -56,41 +178,80 @@ def fetch_serper(
     Exception
         Propagates any exception encountered during the API call.
     """
-    url = "https://google.serper.dev/search"
-    payload = {
-        "q": query,
-        "gl": "us",
-        "type": "search",
-        "includeSubtitle": True,
-        "engine": "google",
-    }
-    headers = {
-        "Content-Type": "application/json",
-        "X-API-KEY": os.getenv("SERPER_API_KEY"),
-    }
+    if _is_known_empty(query):
+        return []
+    body = _encode_query(query, num_sites_per_query)
 
-    response = session.post(url, headers=headers, json=payload, timeout=10.0)
+    _RATE_LIMITER.acquire()
+    response = session.post(
+        SERPER_URL, headers=_HEADERS, content=body, timeout=_TIMEOUT
+    )
     response.raise_for_status()
-    data = response.json()
-
-    sites: list[SerpedSite] = []
-    for site_data in data.get("organic", [])[:num_sites_per_query]:
-        site = SerpedSite(
-            url=site_data.get("link", ""),
-            title=site_data.get("title", ""),
-            snippet=site_data.get("snippet", "") if "snippet" in site_data else "",
-            source=site_data.get("source", ""),
-        )
-        sites.append(site)
 
+    sites = _parse_sites(response.content, num_sites_per_query)
+    _remember_if_empty(query, sites, num_sites_per_query)
     return sites
 
 
+async def fetch_serper_async(
+    client: httpx.AsyncClient,
+    query: str,
+    num_sites_per_query: int,
+) -> list[SerpedSite]:
+    """
+    Asynchronously query the SERP API for a single search query.
+
+    Shares the rate limit with ``fetch_serper``; see it for parameters.
+    """
+    if _is_known_empty(query):
+        return []
+    body = _encode_query(query, num_sites_per_query)
+
+    await asyncio.sleep(_RATE_LIMITER.reserve())
+    response = await client.post(
+        SERPER_URL, headers=_HEADERS, content=body, timeout=_TIMEOUT
+    )
+    response.raise_for_status()
+
+    sites = _parse_sites(response.content, num_sites_per_query)
+    _remember_if_empty(query, sites, num_sites_per_query)
+    return sites
+
+
+async def fetch_serper_batch_async(
+    queries: list[str],
+    num_sites_per_query: int,
+) -> list[list[SerpedSite] | Exception]:
+    """Fetch SERP data for a batch of search queries concurrently.
+
+    For callers already running an event loop. All queries are in flight at
+    once over a shared HTTP/2 connection, paced only by the rate limit. The
+    async client lives for this batch only, so each call opens its own
+    connection. See ``fetch_serper_batch_by_limit`` for parameters and return
+    value.
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=_HTTP2, limits=_LIMITS, retries=_RETRIES
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        return await asyncio.gather(
+            *(
+                fetch_serper_async(client, query, num_sites_per_query)
+                for query in queries
+            ),
+            return_exceptions=True,
+        )
+
+
 def fetch_serper_batch_by_limit(
     queries: list[str],
     num_sites_per_query: int,
-) -> list[list[SerpedSite | Exception]]:
-    """Fetch SERP data for a batch of search queries.
+) -> list[list[SerpedSite] | Exception]:
+    """Fetch SERP data for a batch of search queries concurrently.
+
+    Queries run on a thread pool over the module's shared HTTP/2 client, so
+    they are multiplexed over the same pooled connection, and later batches
+    reuse it too. They are paced by the rate limit.
 
     Parameters
     ----------
@@ -101,23 +262,20 @@ def fetch_serper_batch_by_limit(
 
     Returns
     -------
-    list[list[SerpedSite | Exception]]
-        A list of lists where each element is a list of SerpedSite objects for a query
+    list[list[SerpedSite] | Exception]
+        A list where each element is a list of SerpedSite objects for a query
         or an Exception if that call failed.
     """
-    results: list[list[SerpedSite | Exception]] = []
-    with requests.Session() as session:
-        session.headers.update({"Content-Type": "application/json"})
-        for query in queries:
-            try:
-                sites = fetch_serper(
-                    session=session,
-                    query=query,
-                    num_sites_per_query=num_sites_per_query,
-                )
-                results.append(sites)
-            except Exception as e:
-                results.append(e)
+    with ThreadPoolExecutor(max_workers=MAX_CALLS) as executor:
+        futures = [
+            executor.submit(fetch_serper, _CLIENT, query, num_sites_per_query)
+            for query in queries
+        ]
+
+    results: list[list[SerpedSite] | Exception] = []
+    for future in futures:
+        error = future.exception()
+        results.append(future.result() if error is None else error)
     return results
 
 
@@ -136,13 +294,11 @@ def get_in_factor_order(lists: list[list[SerpedSite]]) -> list[SerpedSite]:
     list[SerpedSite]
         A single list with elements taken in alternating order from each sublist.
     """
-    max_len = max(len(lst) for lst in lists) if lists else 0
-    result: list[SerpedSite] = []
-    for i in range(max_len):
-        for lst in lists:
-            if i < len(lst):
-                result.append(lst[i])
-    return result
+    if len(set(map(len, lists))) <= 1:
+        # Equal lengths (the usual full pages of results): no padding to filter,
+        # so the whole interlace runs inside itertools.
+        return list(chain.from_iterable(zip(*lists)))
+    return [site for column in zip_longest(*lists) for site in column if site is not None]
 
 
 def serp_and_process(
@@ -184,19 +340,16 @@ def serp_and_process(
         else:
             fetched_sites_lists.append(result)
 
-    # Interlace results from different queries.
-    if fetched_sites_lists:
-        interlaced_sites = get_in_factor_order(fetched_sites_lists)
-        # Deduplicate while preserving order based on the site URL.
-        seen = set()
-        deduped_sites = []
-        for site in interlaced_sites:
-            if site.url not in seen:
+    # Interlace results from different queries and deduplicate them on the
+    # site URL in a single pass, as in get_in_factor_order.
+    seen: set[str] = set()
+    deduped_sites: list[SerpedSite] = []
+    for column in zip_longest(*fetched_sites_lists):
+        for site in column:
+            if site is not None and site.url not in seen:
                 seen.add(site.url)
                 deduped_sites.append(site)
-        return deduped_sites
-    else:
-        return []
+    return deduped_sites
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+"""
+Module for thread-safe token-bucket rate limiting, globally or per destination host.
+"""
+
+import threading
+import time
+
+from cachetools import TLRUCache
+
+
+class TokenBucket:
+    """
+    Token bucket allowing ``calls`` calls per ``period`` seconds, with bursts of up to ``calls``.
+
+    Callers reserve a token and are told how long to wait for it, so the lock
+    is only held for the refill arithmetic and never while sleeping.
+    Because ``reserve`` never blocks, async code can share a bucket with
+    threads by awaiting ``asyncio.sleep(bucket.reserve())``.
+    """
+
+    __slots__ = ("calls", "period", "_tokens", "_updated", "_lock")
+
+    def __init__(self, calls: int, period: float) -> None:
+        self.calls = calls
+        self.period = period
+        self._tokens = float(calls)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Reserve a token and return how long to wait before using it.
+
+        Returns
+        -------
+        float
+            The number of seconds to wait, 0.0 if a token was available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.calls,
+                self._tokens + (now - self._updated) * self.calls / self.period,
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens * self.period / self.calls
+
+    def refilled_at(self) -> float:
+        """Return the ``time.monotonic`` time at which the bucket is full again if unused."""
+        with self._lock:
+            return self._updated + (self.calls - self._tokens) * self.period / self.calls
+
+    def acquire(self) -> None:
+        """Block until a token is available and consume it."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DomainRateLimiter:
+    """
+    Rate limiter keeping a separate ``TokenBucket`` per domain.
+
+    Calls to different domains never wait on each other, while each single
+    domain is limited to ``calls`` calls per ``period`` seconds. A bucket is
+    dropped once it has refilled, since a fresh one behaves the same, so
+    memory only grows with the number of recently used domains.
+    """
+
+    def __init__(self, calls: int, period: float, max_domains: int = 100_000) -> None:
+        self.calls = calls
+        self.period = period
+        self._buckets: TLRUCache = TLRUCache(
+            maxsize=max_domains,
+            ttu=lambda domain, bucket, now: bucket.refilled_at(),
+            timer=time.monotonic,
+        )
+        self._lock = threading.Lock()
+
+    def acquire(self, domain: str) -> None:
+        """Block until a call to ``domain`` is allowed."""
+        with self._lock:
+            bucket = self._buckets.get(domain)
+            if bucket is None:
+                bucket = TokenBucket(self.calls, self.period)
+            delay = bucket.reserve()
+            # (Re-)insert after reserving so the expiry covers this reservation.
+            self._buckets[domain] = bucket
+        if delay > 0:
+            time.sleep(delay)